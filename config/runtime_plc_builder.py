@@ -3,29 +3,8 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, List
 
-from wntr.network import WaterNetworkModel
-
-from physical.controls_parser import parse_controls_from_inp, ControlRule
-
-
-def _infer_element_type(model: WaterNetworkModel, link_id: str) -> str:
-    link = model.get_link(link_id)
-    klass = link.__class__.__name__.lower()
-    if "pump" in klass:
-        return "pump"
-    if "valve" in klass:
-        return "valve"
-    return "link"
-
-
-def _node_type(model: WaterNetworkModel, node_id: str) -> str:
-    node = model.get_node(node_id)
-    klass = node.__class__.__name__.lower()
-    if "tank" in klass:
-        return "tank"
-    if "reservoir" in klass:
-        return "reservoir"
-    return "junction"
+from physical.controls_parser import ControlRule
+from physical.wn_cache import load_control_rules, load_wn_model
 
 
 def build_runtime_plc_config(user_plc_config: Dict, inp_path: Path | str) -> Dict:
@@ -34,77 +13,71 @@ def build_runtime_plc_config(user_plc_config: Dict, inp_path: Path | str) -> Dic
     from the INP [CONTROLS] section. Returns a full PLC config dict consumable by
     SCADA/PLC code.
     """
-    inp_path = Path(inp_path)
-    model = WaterNetworkModel(str(inp_path))
-    controls = parse_controls_from_inp(inp_path)
+    model = load_wn_model(inp_path)
+    controls = load_control_rules(inp_path)
+
+    # Element kinds from WNTR's typed name lists; O(1) membership per lookup.
+    pumps = set(model.pump_name_list)
+    valves = set(model.valve_name_list)
+    tanks = set(model.tank_name_list)
+    reservoirs = set(model.reservoir_name_list)
 
     # Index minimal PLC entries by element_id.
     user_by_elem = {plc["element_id"]: plc for plc in user_plc_config.get("plcs", [])}
 
-    runtime_plcs: List[Dict] = []
-    sensor_nodes: set[str] = set()
-
     # Group control rules by actuator link so we can evaluate them together later.
     rules_by_link: Dict[str, List[ControlRule]] = {}
     for ctl in controls:
         rules_by_link.setdefault(ctl.link_id, []).append(ctl)
 
-    for link_id, rules in rules_by_link.items():
-        minimal = user_by_elem.get(link_id)
-        if minimal is None:
-            # If no user entry, synthesize a PLC id/ip placeholder.
-            minimal = {
-                "id": f"PLC_{link_id}",
-                "element_id": link_id,
-                "ip": "10.0.0.250",
-            }
-
-        sensor_nodes.update({r.node_id for r in rules})
+    # Keyed by PLC id so duplicate checks are O(1); insertion order is the output order.
+    runtime_plcs_by_id: Dict[str, Dict] = {}
+    # Conditioning nodes in first-seen order (dict used as an ordered set).
+    sensor_nodes: Dict[str, None] = {}
 
-        logic_rules = [
-            {
-                "node_id": r.node_id,
-                "comparator": r.comparator,
-                "threshold": r.threshold,
-                "action": r.action,
-                "priority": r.priority,
-                "rule_index": r.rule_index,
-            }
-            for r in rules
-        ]
-
-        plc_entry = {
+    for link_id, rules in rules_by_link.items():
+        # If no user entry, synthesize a PLC id/ip placeholder.
+        minimal = user_by_elem.get(link_id) or {"id": f"PLC_{link_id}", "element_id": link_id}
+        sensor_nodes.update(dict.fromkeys(r.node_id for r in rules))
+        runtime_plcs_by_id[minimal["id"]] = {
             "id": minimal["id"],
             "element_id": minimal["element_id"],
             "ip": minimal.get("ip", "10.0.0.250"),
             "role": "actuator",
-            "type": _infer_element_type(model, link_id),
+            "type": "pump" if link_id in pumps else "valve" if link_id in valves else "link",
             "logic": {
                 "mode": "rule_list",
-                "node_id": rules[0].node_id if rules else None,
-                "rules": logic_rules,
+                "node_id": rules[0].node_id,
+                "rules": [
+                    {
+                        "node_id": r.node_id,
+                        "comparator": r.comparator,
+                        "threshold": r.threshold,
+                        "action": r.action,
+                        "priority": r.priority,
+                        "rule_index": r.rule_index,
+                    }
+                    for r in rules
+                ],
             },
         }
-        runtime_plcs.append(plc_entry)
 
     # Add sensor PLCs for conditioning nodes if missing.
-    existing_sensor_nodes = {plc["element_id"] for plc in runtime_plcs if plc.get("role") == "sensor"}
     for node_id in sensor_nodes:
-        if node_id in existing_sensor_nodes:
+        plc_id = f"PLC_SENSOR_{node_id}"
+        if plc_id in runtime_plcs_by_id:
             continue
-        runtime_plcs.append(
-            {
-                "id": f"PLC_SENSOR_{node_id}",
-                "element_id": node_id,
-                "ip": f"10.0.1.{len(runtime_plcs)+10}",
-                "role": "sensor",
-                "type": _node_type(model, node_id),
-                "logic": {"mode": "report_level", "node_id": node_id},
-            }
-        )
+        runtime_plcs_by_id[plc_id] = {
+            "id": plc_id,
+            "element_id": node_id,
+            "ip": f"10.0.1.{len(runtime_plcs_by_id)+10}",
+            "role": "sensor",
+            "type": "tank" if node_id in tanks else "reservoir" if node_id in reservoirs else "junction",
+            "logic": {"mode": "report_level", "node_id": node_id},
+        }
 
     runtime_cfg = {
         "scada": user_plc_config.get("scada", {}),
-        "plcs": runtime_plcs,
+        "plcs": list(runtime_plcs_by_id.values()),
     }
     return runtime_cfg
@@ -1,18 +1,111 @@
 import json
-from typing import Any, Dict
+import logging
+import os
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def _loads(payload: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload.decode("utf-8"))
 
 
 def encode_plc_request(plc_state: Dict[str, Any]) -> bytes:
-    return json.dumps(plc_state).encode("utf-8")
+    return _dumps(plc_state)
+
+
+def encode_plc_request_prefix(plc_id: Any, role: Any) -> bytes:
+    """
+    Encode the static head of a PLC request, without the closing brace, so
+    per-step encoding only has to serialize time and observations.
+    """
+    return _dumps({"plc_id": plc_id, "role": role})[:-1]
+
+
+def encode_plc_request_tail(prefix: bytes, time: Any, observations: Dict[str, Any]) -> bytes:
+    """Complete a prefix from encode_plc_request_prefix into a full request payload."""
+    return prefix + b',"time":' + _dumps(time) + b',"observations":' + _dumps(observations) + b"}"
 
 
 def decode_plc_request(payload: bytes) -> Dict[str, Any]:
-    return json.loads(payload.decode("utf-8"))
+    return _loads(payload)
 
 
 def encode_scada_reply(reply: Dict[str, Any]) -> bytes:
-    return json.dumps(reply).encode("utf-8")
+    return _dumps(reply)
 
 
 def decode_scada_reply(payload: bytes) -> Dict[str, Any]:
-    return json.loads(payload.decode("utf-8"))
+    return _loads(payload)
+
+
+def encode_plc_request_batch(plc_states: List[Dict[str, Any]]) -> bytes:
+    """Pack all PLC requests of one simulation step into a single JSON array."""
+    return _dumps(plc_states)
+
+
+def decode_plc_request_batch(payload: bytes) -> List[Dict[str, Any]]:
+    return _loads(payload)
+
+
+def encode_scada_reply_batch(replies: List[Dict[str, Any]]) -> bytes:
+    return _dumps(replies)
+
+
+def decode_scada_reply_batch(payload: bytes) -> List[Dict[str, Any]]:
+    return _loads(payload)
+
+
+def encode_plc_request_msgpack(plc_state: Dict[str, Any]) -> bytes:
+    return msgpack.packb(plc_state)
+
+
+def decode_plc_request_msgpack(payload: bytes) -> Dict[str, Any]:
+    return msgpack.unpackb(payload, raw=False)
+
+
+def encode_scada_reply_msgpack(reply: Dict[str, Any]) -> bytes:
+    return msgpack.packb(reply)
+
+
+def decode_scada_reply_msgpack(payload: bytes) -> Dict[str, Any]:
+    return msgpack.unpackb(payload, raw=False)
+
+
+# Wire codec chosen once at import time via DHALSIM_WIRE_FORMAT (json or msgpack), for a
+# future networked PLC/SCADA path: nothing in the in-process simulation calls these yet.
+# JSON stays the default; the prefix/tail request helpers above are JSON-only.
+WIRE_FORMAT = os.environ.get("DHALSIM_WIRE_FORMAT", "json").lower()
+if WIRE_FORMAT == "msgpack" and msgpack is None:
+    logger.warning("DHALSIM_WIRE_FORMAT=msgpack but msgpack is not installed; using JSON.")
+    WIRE_FORMAT = "json"
+
+if WIRE_FORMAT == "msgpack":
+    ENCODE_REQUEST = encode_plc_request_msgpack
+    DECODE_REQUEST = decode_plc_request_msgpack
+    ENCODE_REPLY = encode_scada_reply_msgpack
+    DECODE_REPLY = decode_scada_reply_msgpack
+else:
+    WIRE_FORMAT = "json"
+    ENCODE_REQUEST = encode_plc_request
+    DECODE_REQUEST = decode_plc_request
+    ENCODE_REPLY = encode_scada_reply
+    DECODE_REPLY = decode_scada_reply
@@ -3,10 +3,14 @@ from __future__ import annotations
 import logging
 from typing import Dict, Any
 
-from wntr.network import WaterNetworkModel
+from ics_network.messages import encode_plc_request_prefix, encode_plc_request_tail
+from physical.wn_cache import native_logic_for
 
 logger = logging.getLogger(__name__)
 
+# Shared read-only default for missing snapshot/reply sections; never mutate.
+_EMPTY: Dict = {}
+
 
 class PlcLogic:
     """
@@ -20,24 +24,35 @@ class PlcLogic:
         self.cached_request: Dict = {}
         self.native_logic: Dict[str, Any] = {}
 
+        # The config is static for the whole run; resolve the fields build_request needs once.
+        self._id = plc_cfg.get("id")
+        self._role = plc_cfg.get("role")
+        self._type = plc_cfg.get("type")
+        self._element_id = plc_cfg.get("element_id")
+        self._logic = plc_cfg.get("logic", {})
+        # Node whose level goes into the request: sensors fall back to their own element,
+        # actuators only observe when they carry logic.
+        self._node_id = None
+        if self._role == "sensor":
+            self._node_id = self._logic.get("node_id") or self._element_id
+        elif self._role == "actuator" and self._logic:
+            self._node_id = self._logic.get("node_id")
+        self._reports_status = self._role == "actuator" and bool(self._logic)
+        self._req_prefix = encode_plc_request_prefix(self._id, self._role)
+
+        # get_actuator_effect() returns actuator commands for the controlled element,
+        # keyed by its EPANET id. Bind the type-specific variant once.
+        self.get_actuator_effect = {
+            ("actuator", "pump"): self._pump_effect,
+            ("actuator", "valve"): self._valve_effect,
+        }.get((self._role, self._type), self._noop_effect)
+
         if inp_path:
             try:
-                model = WaterNetworkModel(str(inp_path))
-                target_id = plc_cfg.get("element_id")
-                # Collect controls and rules that involve this actuator.
-                controls = []
-                for ctl_name in getattr(model, "control_name_list", []) or []:
-                    ctl = model.get_control(ctl_name)
-                    ctl_str = str(ctl)
-                    if target_id and target_id in ctl_str:
-                        controls.append(ctl_str)
-                rules = []
-                for rule in getattr(model, "rules", []) or []:
-                    rule_str = str(rule)
-                    if target_id and target_id in rule_str:
-                        rules.append(rule_str)
-                self.native_logic = {"controls": controls, "rules": rules}
-                if controls or rules:
+                target_id = self._element_id
+                # Controls and rules that involve this element, from the shared per-INP index.
+                self.native_logic = native_logic_for(inp_path, target_id)
+                if self.native_logic["controls"] or self.native_logic["rules"]:
                     logger.info(
                         "PLC %s initialized with native logic targeting %s: %s",
                         plc_cfg.get("id"),
@@ -48,64 +63,57 @@ class PlcLogic:
                 logger.warning("Failed to load native logic for %s: %s", plc_cfg.get("id"), exc)
 
     def build_request(self, physical_state: Dict) -> Dict:
-        plc_id = self.cfg.get("id")
-        role = self.cfg.get("role")
-        element_id = self.cfg.get("element_id")
-
-        observations: Dict = {}
-        logic = self.cfg.get("logic", {})
-
-        # Sensor PLC: report its node value.
-        if role == "sensor":
-            node_id = logic.get("node_id") or element_id
-            level = physical_state.get("tanks", {}).get(node_id)
-            if level is not None:
-                observations["level"] = float(level)
-
-        if role == "actuator":
-            if logic:
-                node_id = logic.get("node_id")
-                if node_id:
-                    level = physical_state.get("tanks", {}).get(node_id)
-                    if level is not None:
-                        observations["level"] = float(level)
-                observations["current_status"] = physical_state.get("pumps", {}).get(
-                    element_id
-                ) or physical_state.get("valves", {}).get(element_id)
-
         request = {
-            "plc_id": plc_id,
-            "role": role,
+            "plc_id": self._id,
+            "role": self._role,
             "time": physical_state.get("time"),
-            "observations": observations,
+            "observations": self._observations(physical_state),
         }
         self.cached_request = request
         return request
 
-    def update_from_scada_reply(self, reply: Dict) -> None:
-        self.last_reply = reply or {}
-
-    def get_actuator_effect(self) -> Dict:
+    def build_request_bytes(self, physical_state: Dict) -> bytes:
         """
-        Return actuator commands for the controlled element. The key matches the
-        EPANET element ID for pumps/valves.
+        JSON-encoded equivalent of build_request() for callers that put the request
+        on the wire: only time and observations are serialized per call. Always
+        JSON, regardless of DHALSIM_WIRE_FORMAT.
         """
-        if self.cfg.get("role") != "actuator":
-            return {}
+        return encode_plc_request_tail(
+            self._req_prefix, physical_state.get("time"), self._observations(physical_state)
+        )
+
+    def _observations(self, physical_state: Dict) -> Dict:
+        observations: Dict = {}
+        if self._node_id:
+            level = physical_state.get("tanks", _EMPTY).get(self._node_id)
+            if level is not None:
+                observations["level"] = float(level)
+        if self._reports_status:
+            element_id = self._element_id
+            pumps = physical_state.get("pumps", _EMPTY)
+            valves = physical_state.get("valves", _EMPTY)
+            observations["current_status"] = pumps.get(element_id) or valves.get(element_id)
+        return observations
 
-        element_id = self.cfg.get("element_id")
-        responses = self.last_reply.get("responses", {})
+    def update_from_scada_reply(self, reply: Dict) -> None:
+        self.last_reply = reply or {}
 
-        if self.cfg.get("type") == "pump":
-            if "override_action" in responses:
-                return {element_id: responses["override_action"]}
-            if "pump_command" in responses:
-                return {element_id: responses["pump_command"]}
+    def _pump_effect(self) -> Dict:
+        responses = self.last_reply.get("responses", _EMPTY)
+        if "override_action" in responses:
+            return {self._element_id: responses["override_action"]}
+        if "pump_command" in responses:
+            return {self._element_id: responses["pump_command"]}
+        return {}
 
-        if self.cfg.get("type") == "valve":
-            if "override_action" in responses:
-                return {element_id: responses["override_action"]}
-            if "valve_setting" in responses:
-                return {element_id: responses["valve_setting"]}
+    def _valve_effect(self) -> Dict:
+        responses = self.last_reply.get("responses", _EMPTY)
+        if "override_action" in responses:
+            return {self._element_id: responses["override_action"]}
+        if "valve_setting" in responses:
+            return {self._element_id: responses["valve_setting"]}
+        return {}
 
+    @staticmethod
+    def _noop_effect() -> Dict:
         return {}
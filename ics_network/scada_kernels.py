@@ -0,0 +1,76 @@
+"""
+Numeric kernels for the SCADA batch and per-request paths.
+
+Numba is optional and only imported on first use: get_dispatch() and
+get_select_action() return the JIT-compiled kernels, or None when numba is
+missing, in which case ScadaServer falls back to its NumPy / pure-Python
+implementations. Callers only ask for a kernel when the workload is large
+enough to pay for the numba import and compilation.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+
+def _dispatch(levels, fallback, pending, rule_owner, rule_below, rule_thr, rule_action, out_cmd):
+    """
+    Resolve one command code per actuator slot.
+
+    Rules must be sorted by owner slot and descending precedence, so the first
+    matching rule of a pending actuator wins; actuators without a match keep
+    their fallback code, and slots without a pending request get -1.
+    """
+    decided = np.zeros(out_cmd.size, dtype=np.bool_)
+    for i in range(out_cmd.size):
+        out_cmd[i] = fallback[i] if pending[i] else -1
+    for r in range(rule_owner.size):
+        slot = rule_owner[r]
+        if decided[slot] or not pending[slot]:
+            continue
+        level = levels[slot]
+        if rule_below[r]:
+            hit = level < rule_thr[r]
+        else:
+            hit = level > rule_thr[r]
+        if hit:
+            out_cmd[slot] = rule_action[r]
+            decided[slot] = True
+
+
+def _select_action(rule_below, rule_thr, rule_action, level):
+    """
+    Return the action code of the first matching rule, or -1 if none match.
+    Rules must be sorted by descending precedence.
+    """
+    for r in range(rule_thr.size):
+        if rule_below[r]:
+            hit = level < rule_thr[r]
+        else:
+            hit = level > rule_thr[r]
+        if hit:
+            return rule_action[r]
+    return -1
+
+
+@lru_cache(maxsize=None)
+def _jit():
+    try:
+        from numba import njit
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return njit(cache=True)
+
+
+@lru_cache(maxsize=None)
+def get_dispatch():
+    """JIT-compiled _dispatch, or None without numba."""
+    jit = _jit()
+    return jit(_dispatch) if jit is not None else None
+
+
+@lru_cache(maxsize=None)
+def get_select_action():
+    """JIT-compiled _select_action, or None without numba."""
+    jit = _jit()
+    return jit(_select_action) if jit is not None else None
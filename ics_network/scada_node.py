@@ -1,10 +1,132 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ics_network.scada_kernels import get_dispatch, get_select_action
 
 logger = logging.getLogger(__name__)
 
+# Commands are stored as small int codes; strings only exist at the message boundary.
+_UNSET = -1
+_STATUS_TO_CODE = {"CLOSED": 0, "OPEN": 1}
+_CODE_TO_STATUS = ("CLOSED", "OPEN")
+
+# Legacy simple modes expressed as a single (comparator, action) rule.
+_LEGACY_MODES = {
+    "open_if_below": ("BELOW", "OPEN"),
+    "close_if_below": ("BELOW", "CLOSED"),
+    "open_if_above": ("ABOVE", "OPEN"),
+    "close_if_above": ("ABOVE", "CLOSED"),
+}
+_BELOW, _ABOVE = 0, 1
+_COMPARATOR_TO_CODE = {"BELOW": _BELOW, "ABOVE": _ABOVE}
+_REPLY_KEYS = {"pump": "pump_command", "valve": "valve_setting"}
+# Shared read-only default for requests without observations; never mutate.
+_EMPTY: Dict = {}
+# Below this many rules a Numba call costs more than the plain Python scan.
+_KERNEL_MIN_RULES = 16
+# Likewise for tick(): below this many actuators the NumPy path is cheaper than
+# importing numba and compiling the dispatch kernel.
+_KERNEL_MIN_ACTUATORS = 64
+# Below this many actuators handle_plc_request_batch answers request by request: the
+# vectorized tick() only beats the scalar path from roughly ten actuators up.
+_BATCH_MIN_ACTUATORS = 10
+
+_OPEN_TOKENS = frozenset({"OPEN", "ON", "1", "TRUE"})
+_CLOSED_TOKENS = frozenset({"CLOSED", "OFF", "0", "FALSE"})
+
+
+def _token_status(token: str) -> Optional[str]:
+    if token in _OPEN_TOKENS:
+        return "OPEN"
+    if token in _CLOSED_TOKENS:
+        return "CLOSED"
+    return None
+
+
+@lru_cache(maxsize=64)
+def _normalize_token(status: str) -> Optional[str]:
+    return _token_status(status.upper())
+
+
+@lru_cache(maxsize=64)
+def _token_code(status: str) -> int:
+    return _STATUS_TO_CODE.get(_normalize_token(status), _UNSET)
+
+
+def _normalize_status(status) -> Optional[str]:
+    """Map a status token to "OPEN"/"CLOSED" (None if unknown); string tokens are memoized."""
+    if isinstance(status, str):
+        return _normalize_token(status)
+    if status is None:
+        return None
+    # Non-string payloads (e.g. a tampered list) may be unhashable, so they skip the cache.
+    return _token_status(str(status).upper())
+
+
+def _status_code(status) -> int:
+    """Map a status token straight to its int8 code (_UNSET if unknown)."""
+    if isinstance(status, str):
+        return _token_code(status)
+    return _STATUS_TO_CODE.get(_normalize_status(status), _UNSET)
+
+
+def _compile_rules(logic: Dict) -> Tuple[Tuple[int, float, int, int, int], ...]:
+    """
+    Normalize an actuator's rules once into (comparator_code, threshold, priority,
+    rule_index, action_code) tuples sorted by descending (priority, rule_index),
+    so evaluation can stop at the first match. A legacy mode becomes a single
+    rule; rules with an unknown comparator or action can never fire and are dropped.
+    """
+    rules = logic.get("rules") or []
+    if not rules and logic.get("mode") in _LEGACY_MODES:
+        comparator, action = _LEGACY_MODES[logic["mode"]]
+        rules = [{"comparator": comparator, "action": action, "threshold": logic.get("threshold", 0)}]
+    compiled = []
+    for rule in rules:
+        cmp_code = _COMPARATOR_TO_CODE.get(str(rule.get("comparator", "")).upper())
+        action = _STATUS_TO_CODE.get(_normalize_status(rule.get("action")))
+        if cmp_code is None or action is None:
+            continue
+        compiled.append(
+            (
+                cmp_code,
+                float(rule.get("threshold", 0)),
+                int(rule.get("priority", 0)),
+                int(rule.get("rule_index", 0)),
+                action,
+            )
+        )
+    # Stable sort: among equal (priority, rule_index) the earlier rule stays first.
+    compiled.sort(key=lambda r: (-r[2], -r[3]))
+    return tuple(compiled)
+
+
+class _CommandView(Mapping):
+    """Read-only, live element_id -> command view over the SCADA command array."""
+
+    def __init__(self, slots: Dict[str, int], codes: np.ndarray) -> None:
+        self._slots = slots
+        self._codes = codes
+
+    def __getitem__(self, element_id: str) -> str:
+        code = self._codes[self._slots[element_id]]
+        if code == _UNSET:
+            raise KeyError(element_id)
+        return _CODE_TO_STATUS[code]
+
+    def __iter__(self) -> Iterator[str]:
+        codes = self._codes
+        return (eid for eid, i in self._slots.items() if codes[i] != _UNSET)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
 
 class ScadaServer:
     """
@@ -14,25 +136,196 @@ class ScadaServer:
 
     def __init__(self, plc_config: Dict) -> None:
         self.plc_config = plc_config
-        self.latest_sensors: Dict[str, float] = {}  # tank_id -> level
+        # Index PLC entries by id once; every request resolves its config here.
+        self._plc_by_id: Dict[str, Dict] = {plc["id"]: plc for plc in plc_config.get("plcs", [])}
+
+        # Dense indices so per-request state is an array slot instead of a string-keyed dict.
+        # Nodes (tank levels) and links (pump/valve commands) are indexed separately since
+        # EPANET lets a node and a link share an id.
+        node_ids: List[str] = []
+        link_ids: List[str] = []
+        for plc in plc_config.get("plcs", []):
+            if plc.get("role") == "actuator":
+                link_ids.append(plc["element_id"])
+                node_id = plc.get("logic", {}).get("node_id")
+                if node_id:
+                    node_ids.append(node_id)
+            else:
+                node_ids.append(plc["element_id"])
+        self._node_idx: Dict[str, int] = {nid: i for i, nid in enumerate(dict.fromkeys(node_ids))}
+        self._link_idx: Dict[str, int] = {lid: i for i, lid in enumerate(dict.fromkeys(link_ids))}
+        # One extra trailing NaN slot serves actuators without a source node.
+        self._sensor_levels = np.full(len(self._node_idx) + 1, np.nan, dtype=np.float64)
+        self._link_cmd = np.full(len(self._link_idx), _UNSET, dtype=np.int8)
+        self._pump_view = _CommandView(self._link_slots(plc_config, "pump"), self._link_cmd)
+        self._valve_view = _CommandView(self._link_slots(plc_config, "valve"), self._link_cmd)
+
+        # Active demo override, if any: at most one PLC is forced at a time.
+        self._override_active = False
+        self._override_plc_id: Optional[str] = None
+        self._override_action: Optional[str] = None
+
+        # Actuator logic compiled once per PLC: (level, fallback) -> action.
+        self._dispatch_fn: Dict[str, Callable[[float, Optional[str]], Optional[str]]] = {
+            plc["id"]: self._compile_actuator_logic(plc.get("logic", {}))
+            for plc in plc_config.get("plcs", [])
+            if plc.get("role") == "actuator"
+        }
+
+        # Per-actuator state for the vectorized batch path (see tick()).
+        actuators = [
+            plc
+            for plc in plc_config.get("plcs", [])
+            if plc.get("role") == "actuator" and plc.get("type") in _REPLY_KEYS
+        ]
+        no_source = len(self._node_idx)
+        self._act_slot: Dict[str, int] = {plc["id"]: i for i, plc in enumerate(actuators)}
+        self._act_reply_key: List[str] = [_REPLY_KEYS[plc["type"]] for plc in actuators]
+        self._act_link = np.array([self._link_idx[plc["element_id"]] for plc in actuators], dtype=np.intp)
+        # tick() evaluates all actuators against the pre-tick commands, so PLCs sharing an
+        # element would not see each other's result as their fallback; such fleets are
+        # answered request by request instead.
+        self._act_links_shared = len(np.unique(self._act_link)) < len(actuators)
+        self._act_src = np.array(
+            [self._node_idx.get(plc.get("logic", {}).get("node_id"), no_source) for plc in actuators],
+            dtype=np.intp,
+        )
+        self._act_obs_level = np.full(len(actuators), np.nan, dtype=np.float64)
+        self._act_status = np.full(len(actuators), _UNSET, dtype=np.int8)
+        self._act_pending = np.zeros(len(actuators), dtype=bool)
+        self._act_cmd = np.full(len(actuators), _UNSET, dtype=np.int8)
+        self._build_rule_table(actuators)
+        self._dispatch_kernel = get_dispatch() if len(actuators) >= _KERNEL_MIN_ACTUATORS else None
 
-        self.pump_commands: Dict[str, str] = {}
-        self.valve_commands: Dict[str, float] = {}
-        self.overrides: Dict[str, str] = {}
+        # DEBUG logging is checked once here instead of per actuator per tick.
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+
+    def refresh_log_level(self) -> None:
+        """Re-read the logger level after logging has been reconfigured."""
+        self._debug = logger.isEnabledFor(logging.DEBUG)
 
     def handle_plc_request(self, request: Dict) -> Dict:
-        plc_id = request.get("plc_id")
-        role = request.get("role")
-        observations = request.get("observations", {})
-        current_time = request.get("time", 0)
+        self._update_overrides(request.get("time", 0))
+        return self._handle_request(request)
+
+    def handle_plc_request_batch(self, requests: List[Dict]) -> List[Dict]:
+        """
+        Handle all PLC requests of one simulation step. Sensor readings and
+        actuator observations are ingested first, then every pump/valve PLC is
+        evaluated in a single tick(), so actuators see this step's sensor values
+        regardless of request order. Replies keep the order of the requests.
+        Small fleets, and fleets where several PLCs drive the same element, skip
+        the vectorized tick() and are answered one by one, still after all sensor
+        readings have been ingested.
+        """
+        if not requests:
+            return []
+        self._update_overrides(requests[0].get("time", 0))
+        if len(self._act_slot) < _BATCH_MIN_ACTUATORS or self._act_links_shared:
+            return self._handle_requests_scalar(requests)
+        self._act_pending[:] = False
+        self._act_obs_level[:] = np.nan
+        self._act_status[:] = _UNSET
+
+        replies: List[Optional[Dict]] = []
+        deferred: List[Tuple[int, str, int]] = []  # (reply position, plc_id, actuator slot)
+        for request in requests:
+            plc_id = request.get("plc_id")
+            slot = self._act_slot.get(plc_id)
+            if slot is None or request.get("role") != "actuator":
+                replies.append(self._handle_request(request))
+                continue
+            self._record_actuator_observations(slot, request.get("observations", _EMPTY))
+            deferred.append((len(replies), plc_id, slot))
+            replies.append(None)
+
+        if deferred:
+            self.tick()
+            for pos, plc_id, slot in deferred:
+                code = self._act_cmd[slot]
+                cmd = None if code == _UNSET else _CODE_TO_STATUS[code]
+                replies[pos] = self._actuator_reply(plc_id, self._act_reply_key[slot], cmd)
+        return replies
+
+    def _handle_requests_scalar(self, requests: List[Dict]) -> List[Dict]:
+        """Small-fleet batch path: ingest sensors first, then answer the rest in order."""
+        replies: List[Optional[Dict]] = [None] * len(requests)
+        for pos, request in enumerate(requests):
+            if request.get("role") == "sensor":
+                replies[pos] = self._handle_request(request)
+        for pos, request in enumerate(requests):
+            if replies[pos] is None:
+                replies[pos] = self._handle_request(request)
+        return replies
+
+    def tick(self) -> None:
+        """
+        Evaluate every actuator with a pending observation in one vectorized
+        pass over the flattened rule table and store the resulting commands.
+        Mirrors _dispatch_actuator_logic: the highest-precedence matching rule
+        wins, otherwise the last command (or current status) is kept. Every
+        fallback is read before the tick, so this assumes one PLC per element.
+        """
+        obs = self._act_obs_level
+        levels = np.where(np.isnan(obs), self._sensor_levels[self._act_src], obs)
+        last = self._link_cmd[self._act_link]
+        fallback = np.where(last != _UNSET, last, self._act_status)
+
+        if self._dispatch_kernel is not None:
+            cmd = self._act_cmd
+            self._dispatch_kernel(
+                levels,
+                fallback,
+                self._act_pending,
+                self._rule_owner,
+                self._rule_below,
+                self._rule_thr,
+                self._rule_action,
+                cmd,
+            )
+        else:
+            cmd = fallback
+            rule_levels = levels[self._rule_owner]
+            hit = np.where(self._rule_below, rule_levels < self._rule_thr, rule_levels > self._rule_thr)
+            # Rules are sorted by owner and descending precedence: the first hit per owner wins.
+            owners, first = np.unique(self._rule_owner[hit], return_index=True)
+            cmd[owners] = self._rule_action[hit][first]
+            cmd[~self._act_pending] = _UNSET
+            self._act_cmd = cmd
+
+        stored = cmd != _UNSET
+        self._link_cmd[self._act_link[stored]] = cmd[stored]
+        if self._debug:
+            for plc_id, slot in self._act_slot.items():
+                if not self._act_pending[slot] or np.isnan(levels[slot]):
+                    continue
+                # Same output as the scalar path: a plain float level and OPEN/CLOSED.
+                code = cmd[slot]
+                logger.debug(
+                    "SCADA tick plc=%s level=%s -> %s",
+                    plc_id,
+                    float(levels[slot]),
+                    None if code == _UNSET else _CODE_TO_STATUS[code],
+                )
 
+    def _update_overrides(self, current_time: float) -> None:
         # Demo override window: force PLC_PUMP_1 OFF between 10000s and 15000s.
-        if 10000 < current_time < 15000:
-            self.overrides["PLC_PUMP_1"] = "OFF"
+        # State only changes when the window edge is crossed.
+        active = 10000 < current_time < 15000
+        if active == self._override_active:
+            return
+        self._override_active = active
+        if active:
+            self._override_plc_id, self._override_action = "PLC_PUMP_1", "OFF"
         else:
-            self.overrides.pop("PLC_PUMP_1", None)
+            self._override_plc_id, self._override_action = None, None
+
+    def _handle_request(self, request: Dict) -> Dict:
+        plc_id = request.get("plc_id")
+        role = request.get("role")
+        observations = request.get("observations", _EMPTY)
 
-        cfg = self._find_plc_cfg(plc_id)
+        cfg = self._plc_by_id.get(plc_id)
         if cfg is None:
             return {"plc_id": plc_id, "responses": {}, "error": "unknown_plc"}
 
@@ -41,42 +334,67 @@ class ScadaServer:
             return {"plc_id": plc_id, "responses": {}}
 
         if role == "actuator":
-            if cfg.get("type") == "pump":
+            reply_key = _REPLY_KEYS.get(cfg.get("type"))
+            if reply_key is not None:
                 cmd = self._dispatch_actuator_logic(cfg, observations)
                 if cmd is not None:
-                    self.pump_commands[cfg["element_id"]] = cmd
-                resp = {}
-                if plc_id in self.overrides:
-                    resp["override_action"] = self.overrides[plc_id]
-                elif cmd is not None:
-                    resp["pump_command"] = cmd
-                return {"plc_id": plc_id, "responses": resp}
-
-            if cfg.get("type") == "valve":
-                cmd = self._dispatch_actuator_logic(cfg, observations)
-                if cmd is not None:
-                    self.valve_commands[cfg["element_id"]] = cmd
-                resp = {}
-                if plc_id in self.overrides:
-                    resp["override_action"] = self.overrides[plc_id]
-                elif cmd is not None:
-                    resp["valve_setting"] = cmd
-                return {"plc_id": plc_id, "responses": resp}
+                    self._store_command(cfg["element_id"], cmd)
+                return self._actuator_reply(plc_id, reply_key, cmd)
 
         return {"plc_id": plc_id, "responses": {}, "error": "unknown_role"}
 
-    def get_actuator_commands(self) -> tuple[Dict[str, str], Dict[str, float]]:
+    def _actuator_reply(self, plc_id: str, reply_key: str, cmd: Optional[str]) -> Dict:
+        resp = {}
+        if plc_id == self._override_plc_id:
+            resp["override_action"] = self._override_action
+        elif cmd is not None:
+            resp[reply_key] = cmd
+        return {"plc_id": plc_id, "responses": resp}
+
+    def _record_actuator_observations(self, slot: int, observations: Dict) -> None:
+        level = observations.get("level")
+        if level is not None:
+            self._act_obs_level[slot] = level
+        self._act_status[slot] = _status_code(observations.get("current_status"))
+        self._act_pending[slot] = True
+
+    def _build_rule_table(self, actuators: List[Dict]) -> None:
         """
-        Return the latest pump/valve commands. The dicts are not cleared so the
-        caller can reuse them if no new messages arrive.
+        Flatten the compiled rules of all actuators into parallel arrays,
+        grouped by owner slot and in descending precedence within each owner.
         """
-        return self.pump_commands.copy(), self.valve_commands.copy()
+        entries = [
+            (slot, cmp_code == _BELOW, threshold, action)
+            for slot, plc in enumerate(actuators)
+            for cmp_code, threshold, _, _, action in _compile_rules(plc.get("logic", {}))
+        ]
+        self._rule_owner = np.array([e[0] for e in entries], dtype=np.intp)
+        self._rule_below = np.array([e[1] for e in entries], dtype=bool)
+        self._rule_thr = np.array([e[2] for e in entries], dtype=np.float64)
+        self._rule_action = np.array([e[3] for e in entries], dtype=np.int8)
 
-    def _find_plc_cfg(self, plc_id: str) -> Dict | None:
-        for plc in self.plc_config.get("plcs", []):
-            if plc.get("id") == plc_id:
-                return plc
-        return None
+    def get_actuator_commands(self) -> tuple[Mapping[str, str], Mapping[str, str]]:
+        """
+        Return the latest pump/valve commands as read-only views. Commands are
+        not cleared so the caller can reuse them if no new messages arrive; the
+        views reflect later updates, so use snapshot() to keep a fixed copy.
+        """
+        return self._pump_view, self._valve_view
+
+    def snapshot(self) -> tuple[Dict[str, str], Dict[str, str]]:
+        """Return independent dict copies of the latest pump/valve commands."""
+        return dict(self._pump_view), dict(self._valve_view)
+
+    def _link_slots(self, plc_config: Dict, elem_type: str) -> Dict[str, int]:
+        elements = (
+            plc["element_id"]
+            for plc in plc_config.get("plcs", [])
+            if plc.get("role") == "actuator" and plc.get("type") == elem_type
+        )
+        return {eid: self._link_idx[eid] for eid in elements}
+
+    def _store_command(self, element_id: str, cmd: str) -> None:
+        self._link_cmd[self._link_idx[element_id]] = _status_code(cmd)
 
     def _ingest_sensor(self, cfg: Dict, observations: Dict) -> None:
         if cfg.get("type") == "tank":
@@ -84,50 +402,61 @@ class ScadaServer:
             if level is None:
                 level = observations.get("level")
             if level is not None:
-                self.latest_sensors[cfg["element_id"]] = float(level)
+                self._sensor_levels[self._node_idx[cfg["element_id"]]] = level
 
-    @staticmethod
-    def _normalize_status(status: Optional[str]) -> Optional[str]:
-        if status is None:
+    def _last_command_for_element(self, element_id: str, elem_type: str) -> Optional[str]:
+        if elem_type not in ("pump", "valve"):
             return None
-        s = str(status).upper()
-        if s in {"OPEN", "ON", "1", "TRUE"}:
-            return "OPEN"
-        if s in {"CLOSED", "OFF", "0", "FALSE"}:
-            return "CLOSED"
-        return None
+        code = self._link_cmd[self._link_idx[element_id]]
+        return None if code == _UNSET else _CODE_TO_STATUS[code]
 
-    def _last_command_for_element(self, element_id: str, elem_type: str) -> Optional[str]:
-        if elem_type == "pump":
-            return self._normalize_status(self.pump_commands.get(element_id))
-        if elem_type == "valve":
-            return self._normalize_status(self.valve_commands.get(element_id))
-        return None
+    def _sensor_level(self, node_id: Optional[str]) -> Optional[float]:
+        idx = self._node_idx.get(node_id)
+        if idx is None:
+            return None
+        level = self._sensor_levels[idx]
+        return None if np.isnan(level) else float(level)
 
-    def _select_rule_action(self, rules: List[Dict], level: float, default_action: Optional[str]) -> Optional[str]:
-        matching = []
-        for rule in rules:
-            comparator = str(rule.get("comparator", "")).upper()
-            action = str(rule.get("action", "")).upper()
-            threshold = float(rule.get("threshold", 0))
-            priority = int(rule.get("priority", 0))
-            rule_index = int(rule.get("rule_index", 0))
+    @staticmethod
+    def _select_rule_action(
+        compiled: Tuple[Tuple[int, float, int, int, int], ...], level: float, default_action: Optional[str]
+    ) -> Optional[str]:
+        # Rules are pre-sorted by descending (priority, rule_index): the first match wins.
+        for cmp_code, threshold, _, _, action in compiled:
+            if (level < threshold) if cmp_code == _BELOW else (level > threshold):
+                return _CODE_TO_STATUS[action]
+        return default_action
 
-            condition_met = False
-            if comparator == "BELOW":
-                condition_met = level < threshold
-            elif comparator == "ABOVE":
-                condition_met = level > threshold
+    def _compile_actuator_logic(self, logic: Dict) -> Callable[[float, Optional[str]], Optional[str]]:
+        """
+        Specialize an actuator's logic block into a single callable so the
+        per-request path does not re-read mode/threshold or walk the mode cascade.
+        """
+        if logic.get("rules"):
+            compiled = _compile_rules(logic)
+            select_action = get_select_action() if len(compiled) >= _KERNEL_MIN_RULES else None
+            if select_action is not None:
+                below = np.array([r[0] == _BELOW for r in compiled], dtype=bool)
+                thr = np.array([r[1] for r in compiled], dtype=np.float64)
+                act = np.array([r[4] for r in compiled], dtype=np.int8)
 
-            if condition_met:
-                matching.append((priority, rule_index, action))
+                def run_kernel(level: float, fallback: Optional[str]) -> Optional[str]:
+                    code = select_action(below, thr, act, level)
+                    return fallback if code < 0 else _CODE_TO_STATUS[code]
 
-        if not matching:
-            return default_action
+                return run_kernel
+            select = self._select_rule_action
+            return lambda level, fallback: select(compiled, level, fallback)
 
-        # Higher priority wins; tie-breaker is later rule_index.
-        _, _, chosen_action = max(matching, key=lambda x: (x[0], x[1]))
-        return chosen_action
+        # Legacy simple modes (kept for compatibility).
+        legacy = _LEGACY_MODES.get(logic.get("mode"))
+        if legacy is None:
+            return lambda level, fallback: fallback
+        comparator, action = legacy
+        threshold = float(logic.get("threshold", 0))
+        if comparator == "BELOW":
+            return lambda level, fallback, t=threshold, a=action: a if level < t else fallback
+        return lambda level, fallback, t=threshold, a=action: a if level > t else fallback
 
     def _dispatch_actuator_logic(self, cfg: Dict, observations: Dict):
         """
@@ -142,42 +471,24 @@ class ScadaServer:
         # Latest measured level.
         level = observations.get("level")
         if level is None and node_id:
-            level = self.latest_sensors.get(node_id)
+            level = self._sensor_level(node_id)
 
         # Normalized current status and last command.
-        current_status = self._normalize_status(observations.get("current_status"))
+        current_status = _normalize_status(observations.get("current_status"))
         last_command = self._last_command_for_element(element_id, elem_type)
         fallback = last_command or current_status
 
-        rules = logic.get("rules") or []
-        if rules:
-            if level is None:
-                return fallback
-            action = self._select_rule_action(rules, float(level), fallback)
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(
-                    "SCADA rule eval element=%s level=%s -> %s (fallback=%s)",
-                    element_id,
-                    level,
-                    action,
-                    fallback,
-                )
-            return action
-
-        # Legacy simple modes (kept for compatibility).
-        mode = logic.get("mode")
-        threshold = float(logic.get("threshold", 0))
-        if level is None and node_id:
-            level = self.latest_sensors.get(node_id)
         if level is None:
             return fallback
-
-        if mode == "open_if_below":
-            return "OPEN" if level < threshold else fallback
-        if mode == "close_if_below":
-            return "CLOSED" if level < threshold else fallback
-        if mode == "open_if_above":
-            return "OPEN" if level > threshold else fallback
-        if mode == "close_if_above":
-            return "CLOSED" if level > threshold else fallback
-        return fallback
+        if not isinstance(level, float):
+            level = float(level)
+        action = self._dispatch_fn[cfg["id"]](level, fallback)
+        if self._debug:
+            logger.debug(
+                "SCADA rule eval element=%s level=%s -> %s (fallback=%s)",
+                element_id,
+                level,
+                action,
+                fallback,
+            )
+        return action
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, NamedTuple
 
+# Compiled once at import. Tokens are separated by [ \t]+ so a match never spans lines;
+# anchoring with ^[ \t]* skips commented (";") lines just like the old per-line scan.
+_SECTION_RE = re.compile(rb"(?im)^[ \t]*\[CONTROLS\]")
+# A repeated [CONTROLS] header continues the section rather than ending it.
+_NEXT_SECTION_RE = re.compile(rb"(?im)^[ \t]*\[(?!CONTROLS\])")
+_CONTROL_RE = re.compile(
+    r"(?im)^[ \t]*LINK[ \t]+(\S+)[ \t]+(OPEN|CLOSED)[ \t]+IF[ \t]+NODE[ \t]+(\S+)[ \t]+(BELOW|ABOVE)"
+    r"[ \t]+([0-9eE\.\+\-]+)(?:[ \t]+PRIORITY[ \t]+([0-9]+))?"
+)
 
-@dataclass
-class ControlRule:
+
+class ControlRule(NamedTuple):
     """
     Parsed representation of a single EPANET [CONTROLS] line.
 
     The optional priority and rule_index fields help us resolve conflicts:
     higher priority wins, and ties fall back to the later rule in the file.
+    Instances are immutable, so identical rules can be shared.
     """
 
     link_id: str
@@ -24,6 +34,13 @@ class ControlRule:
     rule_index: int = 0
 
 
+@lru_cache(maxsize=1024)
+def _make_rule(
+    link_id: str, node_id: str, comparator: str, action: str, threshold: float, priority: int, rule_index: int
+) -> ControlRule:
+    return ControlRule(link_id, node_id, comparator, action, threshold, priority, rule_index)
+
+
 def parse_controls_from_inp(inp_path: Path | str) -> List[ControlRule]:
     """
     Parse a limited subset of EPANET [CONTROLS] lines from an INP file.
@@ -36,41 +53,31 @@ def parse_controls_from_inp(inp_path: Path | str) -> List[ControlRule]:
         raise FileNotFoundError(f"INP not found: {path}")
 
     controls: List[ControlRule] = []
-    in_controls = False
-    pattern = re.compile(
-        r"LINK\s+(\S+)\s+(OPEN|CLOSED)\s+IF\s+NODE\s+(\S+)\s+(BELOW|ABOVE)\s+([0-9eE\.\+\-]+)"
-        r"(?:\s+PRIORITY\s+([0-9]+))?",
-        re.IGNORECASE,
-    )
 
-    rule_index = 0
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith(";"):
-                continue
-            if line.upper().startswith("[CONTROLS]"):
-                in_controls = True
-                continue
-            if in_controls and line.startswith("["):
-                # Reached next section
-                break
-            if not in_controls:
-                continue
-            m = pattern.match(line)
-            if not m:
-                continue
-            link_id, action, node_id, comparator, threshold, priority = m.groups()
-            controls.append(
-                ControlRule(
-                    link_id=link_id,
-                    node_id=node_id,
-                    comparator=comparator.upper(),
-                    action=action.upper(),
-                    threshold=float(threshold),
-                    priority=int(priority) if priority is not None else 0,
-                    rule_index=rule_index,
-                )
+    # Locate the [CONTROLS] slice in the raw bytes and decode only that slice, so the
+    # (often much larger) network sections never go through the text layer.
+    blob = path.read_bytes()
+    if b"\r" in blob:
+        # Same universal-newline handling as text mode.
+        blob = blob.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    header = _SECTION_RE.search(blob)
+    if header is None:
+        return controls
+    # Slice from the start of the header line so text sharing that line is never taken
+    # for a control (the section string's own start is a "^" position).
+    nxt = _NEXT_SECTION_RE.search(blob, header.end())
+    section = blob[header.start() : nxt.start() if nxt else len(blob)].decode("utf-8")
+    for rule_index, m in enumerate(_CONTROL_RE.finditer(section)):
+        link_id, action, node_id, comparator, threshold, priority = m.groups()
+        controls.append(
+            _make_rule(
+                link_id,
+                node_id,
+                comparator.upper(),
+                action.upper(),
+                float(threshold),
+                int(priority) if priority is not None else 0,
+                rule_index,
             )
-            rule_index += 1
+        )
     return controls
@@ -1,15 +1,70 @@
+import ctypes
 import logging
+import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from wntr.network import WaterNetworkModel
-from wntr.sim import WNTRSimulator
+import numpy as np
 from wntr.epanet import toolkit as enData
-from wntr.epanet.util import EN
+from wntr.epanet.util import EN, SizeLimits
 
 
 logger = logging.getLogger(__name__)
 
+# Must match the status vocabulary of ics_network.scada_node (_OPEN_TOKENS/_CLOSED_TOKENS).
+_ON_TOKENS = frozenset({"ON", "OPEN", "1", "TRUE"})
+_OFF_TOKENS = frozenset({"OFF", "CLOSED", "0", "FALSE"})
+# EPANET parameter codes as plain ints: ctypes converts an int far faster than an EN enum member.
+_HEAD = int(EN.HEAD)
+_STATUS = int(EN.STATUS)
+_EN_NO_REPORT = 0  # EN_StatusReport.EN_NO_REPORT
+
+
+@lru_cache(maxsize=64)
+def _parse_token(cmd: str) -> int:
+    return 1 if cmd.upper() in _ON_TOKENS else 0
+
+
+def _parse_status(cmd) -> int:
+    """Return the link STATUS code for a command: 1 for an ON/OPEN token, else 0."""
+    if isinstance(cmd, str):
+        return _parse_token(cmd)
+    # Only strings are memoized: other payloads may be unhashable.
+    return 1 if str(cmd).upper() in _ON_TOKENS else 0
+
+
+def _raw_getter(en, lib_name: str, fallback: Callable[[int, int], float]) -> Callable[[int, int], float]:
+    """
+    Bind an EPANET 2.2 value getter straight to the shared library, skipping the
+    wntr wrapper's per-call ctypes setup (EPANET 2.2 has no batched getters). A
+    non-zero error code re-issues the call through the wrapper, so warnings and
+    exceptions surface exactly as before.
+    """
+    project = getattr(en, "_project", None)
+    fn = getattr(en.ENlib, lib_name, None)
+    if project is None or fn is None:
+        return fallback
+    value = ctypes.c_double()
+    ref = ctypes.byref(value)
+
+    def get(index: int, code: int) -> float:
+        if fn(project, index, code, ref):
+            return fallback(index, code)
+        return value.value
+
+    return get
+
+
+def _link_id(en, index: int) -> str:
+    """ENgetlinkid is missing from wntr's ENepanet wrapper; same call shape as its ENgetnodeid."""
+    buf = ctypes.create_string_buffer(SizeLimits.EN_MAX_ID.value)
+    if en._project is not None:
+        en.errcode = en.ENlib.EN_getlinkid(en._project, index, ctypes.byref(buf))
+    else:
+        en.errcode = en.ENlib.ENgetlinkid(index, ctypes.byref(buf))
+    en._error()
+    return str(buf.value, "UTF-8")
 
 
 class ClosedLoopPhysicalSimulator:
@@ -36,38 +91,103 @@ class ClosedLoopPhysicalSimulator:
         self.valve_ids: List[str] = []
         self.link_name_to_index: Dict[str, int] = {}
         self.node_name_to_index: Dict[str, int] = {}
+        # Resolved once in initialize(): tank ids/indices with their static elevations,
+        # and (id, EPANET index) pairs for pumps and valves.
+        self._tank_names: List[str] = []
+        self._tank_nidx: List[int] = []
+        self._tank_elev = np.empty(0, dtype=np.float64)
+        self._pump_entries: List[Tuple[str, int]] = []
+        self._valve_entries: List[Tuple[str, int]] = []
 
         self.pump_commands: Dict[str, str] = {}
         self.valve_commands: Dict[str, float] = {}
+        # Per-link int8 status arrays indexed by EPANET link index (slot 0 unused), sized in
+        # initialize(): this tick's commands (-1 = none) and the last status we wrote (-1 =
+        # unknown), used to push only the links that change.
+        self._cmd_array = np.empty(0, dtype=np.int8)
+        self._last_link_status = np.empty(0, dtype=np.int8)
+
+        # Snapshot dicts reused by every step(); the key sets are fixed after initialize(),
+        # so each step only overwrites values. Callers must copy anything they keep.
+        self._tanks_buf: Dict[str, float] = {}
+        self._pumps_buf: Dict[str, str] = {}
+        self._valves_buf: Dict[str, str] = {}
+        self._snap_buf: Dict = {
+            "time": 0.0,
+            "tanks": self._tanks_buf,
+            "pumps": self._pumps_buf,
+            "valves": self._valves_buf,
+        }
 
         # EPANET engine handle，会在 initialize 里真正打开
         self._en = enData.ENepanet()
+        # Node/link value getters, rebound to the raw library calls once the engine is open.
+        self._node_value: Callable[[int, int], float] = self._en.ENgetnodevalue
+        self._link_value: Callable[[int, int], float] = self._en.ENgetlinkvalue
+        # (inp path, duration, step) the open engine was configured for; None when closed.
+        self._engine_opened_for: Optional[Tuple[str, float, float]] = None
 
     def initialize(self) -> None:
         if not self.inp_path.exists():
             raise FileNotFoundError(f"Missing EPANET file: {self.inp_path}")
 
+        engine_key = (str(self.inp_path), self.duration_seconds, self.step_seconds)
+        if self._engine_opened_for == engine_key:
+            # Same network and timing: rewind the open hydraulic solver instead of
+            # reopening the toolkit, resetting time params and rebuilding the indices.
+            # 10 = also re-initialize link flows, so the rerun matches a fresh open.
+            self._en.ENinitH(10)
+            self._last_link_status.fill(-1)
+            self.pump_commands = {}
+            self.valve_commands = {}
+            self.current_time_s = 0.0
+            self.finished = False
+            return
+
         # 打开 EPANET 工具箱引擎
-        self._en.ENopen(str(self.inp_path), "closed_loop.rpt", "")
+        # Nobody reads the text report: send it to the null device and switch off the
+        # per-step hydraulic status lines an INP may request ([REPORT] Status Yes/Full).
+        self._en.ENopen(str(self.inp_path), os.devnull, "")
+        set_status_report = getattr(self._en.ENlib, "EN_setstatusreport", None)
+        if set_status_report is not None and getattr(self._en, "_project", None) is not None:
+            set_status_report(self._en._project, _EN_NO_REPORT)
+        self._node_value = _raw_getter(self._en, "EN_getnodevalue", self._en.ENgetnodevalue)
+        self._link_value = _raw_getter(self._en, "EN_getlinkvalue", self._en.ENgetlinkvalue)
 
         self._en.ENsettimeparam(EN.DURATION, int(self.duration_seconds))
         self._en.ENsettimeparam(EN.HYDSTEP, int(self.step_seconds))
         self._en.ENsettimeparam(EN.REPORTSTEP, int(self.step_seconds))
         self._en.ENsettimeparam(EN.REPORTSTART, 0)
 
-        # 用 WNTR 读网络，拿到 ID 列表
-        wn = WaterNetworkModel(str(self.inp_path))
-        self.tank_ids = wn.tank_name_list
-        self.pump_ids = wn.pump_name_list
-        self.valve_ids = wn.valve_name_list
+        # 直接从已打开的 EPANET 工程枚举 ID 和类型（索引从 1 开始），不再经过 WNTR 模型
+        node_count = self._en.ENgetcount(EN.NODECOUNT)
+        link_count = self._en.ENgetcount(EN.LINKCOUNT)
+        node_ids = [self._en.ENgetnodeid(i) for i in range(1, node_count + 1)]
+        link_ids = [_link_id(self._en, i) for i in range(1, link_count + 1)]
+        link_types = [self._en.ENgetlinktype(i) for i in range(1, link_count + 1)]
+        self.tank_ids = [nid for i, nid in enumerate(node_ids, 1) if self._en.ENgetnodetype(i) == EN.TANK]
+        self.pump_ids = [lid for lid, ltype in zip(link_ids, link_types) if ltype == EN.PUMP]
+        self.valve_ids = [lid for lid, ltype in zip(link_ids, link_types) if ltype >= EN.PRV]
 
         # 建立 name -> index 映射表，方便后续 ENgetlinkvalue/ENgetnodevalue
-        for lid in wn.link_name_list:
-            idx = self._en.ENgetlinkindex(lid)
-            self.link_name_to_index[lid] = idx
-        for nid in wn.node_name_list:
-            idx = self._en.ENgetnodeindex(nid)
-            self.node_name_to_index[nid] = idx
+        self.link_name_to_index = {lid: i for i, lid in enumerate(link_ids, 1)}
+        self.node_name_to_index = {nid: i for i, nid in enumerate(node_ids, 1)}
+
+        self._cmd_array = np.full(link_count + 1, -1, dtype=np.int8)
+        self._last_link_status = np.full(link_count + 1, -1, dtype=np.int8)
+
+        # Tank elevation is static network data: read it once instead of every step.
+        self._tank_names = [tid for tid in self.tank_ids if tid in self.node_name_to_index]
+        self._tank_nidx = [self.node_name_to_index[tid] for tid in self._tank_names]
+        self._tank_elev = np.array(
+            [self._node_value(nidx, EN.ELEVATION) for nidx in self._tank_nidx], dtype=np.float64
+        )
+        self._pump_entries = [
+            (pid, self.link_name_to_index[pid]) for pid in self.pump_ids if pid in self.link_name_to_index
+        ]
+        self._valve_entries = [
+            (vid, self.link_name_to_index[vid]) for vid in self.valve_ids if vid in self.link_name_to_index
+        ]
 
         # 打开水力分析
         self._en.ENopenH()
@@ -76,36 +196,54 @@ class ClosedLoopPhysicalSimulator:
 
         self.current_time_s = 0.0
         self.finished = False
+        self._engine_opened_for = engine_key
         logger.info("Closed-loop: opened EPANET toolkit for %s", self.inp_path)
 
     def apply_actuator_commands(
-        self, pump_commands: Dict[str, str], valve_commands: Dict[str, float]
+        self, pump_commands: Dict[str, str], valve_commands: Dict[str, float], defensive: bool = False
     ) -> None:
         """
         在下一步 ENrunH 之前，把 PLC/SCADA 的控制命令写到 EPANET 的 link status 里。
+
+        The dicts are kept by reference; callers must not mutate them afterwards
+        unless they pass defensive=True to have copies stored instead.
         """
-        self.pump_commands = pump_commands.copy()
-        self.valve_commands = valve_commands.copy()
-
-        # Pumps
-        for pump_id, cmd in self.pump_commands.items():
-            idx = self.link_name_to_index.get(pump_id)
-            if idx is None:
-                continue
-            status = 1.0 if str(cmd).upper() in {"ON", "OPEN", "1", "TRUE"} else 0.0
-            self._en.ENsetlinkvalue(idx, EN.STATUS, status)
-
-        # Valves
-        for valve_id, cmd in self.valve_commands.items():
-            idx = self.link_name_to_index.get(valve_id)
-            if idx is None:
-                continue
-            status = 1.0 if str(cmd).upper() in {"ON", "OPEN", "1", "TRUE"} else 0.0
-            self._en.ENsetlinkvalue(idx, EN.STATUS, status)
+        if defensive:
+            pump_commands = dict(pump_commands)
+            valve_commands = dict(valve_commands)
+        self.pump_commands = pump_commands
+        self.valve_commands = valve_commands
+
+        # Scatter this tick's commands into the per-link array, then push only the links
+        # whose command differs from the last value written. step() forgets a written value
+        # once the engine reports a different status (e.g. an INP control flipped the link).
+        cmd = self._cmd_array
+        cmd.fill(-1)
+        for commands in (self.pump_commands, self.valve_commands):
+            for link_id, value in commands.items():
+                idx = self.link_name_to_index.get(link_id)
+                if idx is None:
+                    continue
+                # Canonical tokens (the interned literals SCADA replies carry) hit the sets
+                # directly; anything else, including non-string (possibly unhashable)
+                # payloads, goes through the case-insensitive parser.
+                if not isinstance(value, str):
+                    cmd[idx] = _parse_status(value)
+                elif value in _ON_TOKENS:
+                    cmd[idx] = 1
+                elif value in _OFF_TOKENS:
+                    cmd[idx] = 0
+                else:
+                    cmd[idx] = _parse_status(value)
+        changed = np.flatnonzero((cmd >= 0) & (cmd != self._last_link_status))
+        for idx in changed.tolist():
+            self._en.ENsetlinkvalue(idx, _STATUS, float(cmd[idx]))
+        self._last_link_status[changed] = cmd[changed]
 
     def step(self) -> Optional[Dict]:
         """
         推进一步水力模型，并返回这一时刻的物理快照。
+        返回的 dict 在每一步被复用（原地更新），调用方如需保留请自行拷贝。
         """
         if self.finished:
             return None
@@ -114,44 +252,40 @@ class ClosedLoopPhysicalSimulator:
         t = self._en.ENrunH()
         self.current_time_s = float(t)
 
-        tanks: Dict[str, float] = {}
-        pumps: Dict[str, str] = {}
-        valves: Dict[str, str] = {}
-
-        # 读水箱水位：head - elevation
-        for tank_id in self.tank_ids:
-            nidx = self.node_name_to_index.get(tank_id)
-            if nidx is None:
-                continue
-            head = float(self._en.ENgetnodevalue(nidx, EN.HEAD))
-            elev = float(self._en.ENgetnodevalue(nidx, EN.ELEVATION))
-            level = head - elev
-            if level < 0:
-                level = 0.0  # 简单防一下数值小负数
-            tanks[tank_id] = level
+        pumps = self._pumps_buf
+        valves = self._valves_buf
+        node_value = self._node_value
+        link_value = self._link_value
+
+        # 读水箱水位：head - elevation（elevation 在 initialize 里缓存），一次向量化相减
+        heads = np.fromiter(
+            (node_value(nidx, _HEAD) for nidx in self._tank_nidx),
+            dtype=np.float64,
+            count=len(self._tank_nidx),
+        )
+        levels = np.maximum(heads - self._tank_elev, 0.0)  # 简单防一下数值小负数
+        self._tanks_buf.update(zip(self._tank_names, levels.tolist()))
+
+        # The read-back is lossy (an ACTIVE valve reads 1 just like OPEN), so it only
+        # invalidates a written status that disagrees; it never stands in for a write.
+        last_status = self._last_link_status
 
         # 读水泵状态
-        for pump_id in self.pump_ids:
-            lidx = self.link_name_to_index.get(pump_id)
-            if lidx is None:
-                continue
-            status = float(self._en.ENgetlinkvalue(lidx, EN.STATUS))
-            pumps[pump_id] = "ON" if status > 0.5 else "OFF"
+        for pump_id, lidx in self._pump_entries:
+            status = 1 if link_value(lidx, _STATUS) > 0.5 else 0
+            if status != last_status[lidx]:
+                last_status[lidx] = -1
+            pumps[pump_id] = "ON" if status else "OFF"
 
         # 读阀门状态
-        for valve_id in self.valve_ids:
-            lidx = self.link_name_to_index.get(valve_id)
-            if lidx is None:
-                continue
-            status = float(self._en.ENgetlinkvalue(lidx, EN.STATUS))
-            valves[valve_id] = "OPEN" if status > 0.5 else "CLOSED"
-
-        snapshot = {
-            "time": self.current_time_s,
-            "tanks": tanks,
-            "pumps": pumps,
-            "valves": valves,
-        }
+        for valve_id, lidx in self._valve_entries:
+            status = 1 if link_value(lidx, _STATUS) > 0.5 else 0
+            if status != last_status[lidx]:
+                last_status[lidx] = -1
+            valves[valve_id] = "OPEN" if status else "CLOSED"
+
+        snapshot = self._snap_buf
+        snapshot["time"] = self.current_time_s
         # 推进到下一个时间步
         tstep = self._en.ENnextH()
         # tstep == 0 表示仿真结束
@@ -162,6 +296,7 @@ class ClosedLoopPhysicalSimulator:
         return snapshot
 
     def close(self) -> None:
+        self._engine_opened_for = None
         try:
             self._en.ENcloseH()
         except Exception:
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from wntr.network import WaterNetworkModel
+
+from physical.controls_parser import ControlRule, parse_controls_from_inp
+
+
+def _cache_key(inp_path: Path | str) -> Tuple[str, int]:
+    """Resolved path plus modification time, so an edited INP file is parsed again."""
+    path = Path(inp_path).resolve()
+    return str(path), path.stat().st_mtime_ns
+
+
+@lru_cache(maxsize=8)
+def _load_wn_model(path: str, mtime_ns: int) -> WaterNetworkModel:
+    return WaterNetworkModel(path)
+
+
+@lru_cache(maxsize=8)
+def _load_control_rules(path: str, mtime_ns: int) -> Tuple[ControlRule, ...]:
+    return tuple(parse_controls_from_inp(path))
+
+
+def _element_ids(control) -> Iterable[str]:
+    """Names of the nodes/links a WNTR control or rule reads or actuates."""
+    names = (getattr(obj, "name", None) for obj in control.requires())
+    return dict.fromkeys(name for name in names if name)
+
+
+@lru_cache(maxsize=8)
+def _native_logic_index(path: str, mtime_ns: int) -> Dict[str, Dict[str, List[str]]]:
+    model = _load_wn_model(path, mtime_ns)
+    index: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: {"controls": [], "rules": []})
+    for ctl_name in getattr(model, "control_name_list", []) or []:
+        ctl = model.get_control(ctl_name)
+        ctl_str = str(ctl)
+        for element_id in _element_ids(ctl):
+            index[element_id]["controls"].append(ctl_str)
+    for rule in getattr(model, "rules", []) or []:
+        rule_str = str(rule)
+        for element_id in _element_ids(rule):
+            index[element_id]["rules"].append(rule_str)
+    return dict(index)
+
+
+def load_wn_model(inp_path: Path | str) -> WaterNetworkModel:
+    """
+    Return the WaterNetworkModel for an INP file, parsing it at most once per
+    resolved path and modification time. The model is shared between callers
+    and must be treated as read-only.
+    """
+    return _load_wn_model(*_cache_key(inp_path))
+
+
+def load_control_rules(inp_path: Path | str) -> Tuple[ControlRule, ...]:
+    """Cached variant of parse_controls_from_inp keyed by resolved path and mtime."""
+    return _load_control_rules(*_cache_key(inp_path))
+
+
+def native_logic_for(inp_path: Path | str, element_id: str | None) -> Dict[str, List[str]]:
+    """
+    Return the stringified INP controls/rules that involve ``element_id``.
+    The index is built once per INP file; the returned lists are shared.
+    """
+    index = _native_logic_index(*_cache_key(inp_path))
+    return index.get(element_id) or {"controls": [], "rules": []}
@@ -1,12 +1,27 @@
+import copy
+import csv
 import logging
 import warnings
-from csv import DictWriter
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List
 
 import matplotlib.pyplot as plt
+import numpy as np
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for output.format: parquet
+    pa = None
+    pq = None
+
 from ics_network.plc_node import PlcLogic
 from ics_network.scada_node import ScadaServer
 from ics_network.topology import WaterCpsTopology
@@ -35,9 +50,15 @@ def _uniq(seq):
     return out
 
 
+@lru_cache(maxsize=32)
+def _load_yaml_cached(path: str, mtime_ns: int) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
 def load_yaml(path: Path) -> Dict:
-    with path.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    # Parsed documents are cached per (path, mtime); callers get their own copy.
+    return copy.deepcopy(_load_yaml_cached(str(path), path.stat().st_mtime_ns))
 
 
 def prepare_output_dir(inp_path: Path, repo_root: Path) -> Path:
@@ -53,10 +74,56 @@ def prepare_output_dir(inp_path: Path, repo_root: Path) -> Path:
         idx += 1
 
 
+class _ParquetRowWriter:
+    """
+    csv.writer-like sink that buffers rows column-wise and flushes them to a
+    Parquet file as record batches. The first n_float columns are float64,
+    the rest (pump/valve statuses) strings.
+    """
+
+    def __init__(self, path: Path, fieldnames: List[str], n_float: int, flush_every: int = 1000) -> None:
+        self._schema = pa.schema(
+            [
+                pa.field(name, pa.float64() if i < n_float else pa.string())
+                for i, name in enumerate(fieldnames)
+            ]
+        )
+        self._writer = pq.ParquetWriter(str(path), self._schema)
+        self._columns: List[List] = [[] for _ in fieldnames]
+        self._flush_every = flush_every
+        self._pending = 0
+
+    def writerow(self, row: List) -> None:
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        self._pending += 1
+        if self._pending >= self._flush_every:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        arrays = [pa.array(column, type=field.type) for column, field in zip(self._columns, self._schema)]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self._schema))
+        for column in self._columns:
+            column.clear()
+        self._pending = 0
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
 def main() -> None:
     repo_root = Path(__file__).parent
     user_plc_cfg = load_yaml(repo_root / "config" / "plc_config.yaml")
     sim_cfg = load_yaml(repo_root / "config" / "sim_config.yaml")
+    # Validate the output format before any engine or output directory is set up.
+    output_format = str(sim_cfg.get("output", {}).get("format", "csv")).lower()
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported output.format {output_format!r}; expected 'csv' or 'parquet'")
+    if output_format == "parquet" and pq is None:
+        raise RuntimeError("output.format 'parquet' requires pyarrow to be installed")
 
     inp_path = repo_root / "water_network" / "minitown.inp"
     plc_cfg = build_runtime_plc_config(user_plc_cfg, inp_path)
@@ -88,84 +155,102 @@ def main() -> None:
     pump_ids = []
     valve_ids = []
     tank_ids = []
-    actuator_plc_by_elem: Dict[str, Any] = {}
+    # The first PLC per pump/valve element decides its command; resolve them once.
+    pump_plc_by_elem: Dict[str, str] = {}
+    valve_plc_by_elem: Dict[str, str] = {}
     for plc in plc_cfg.get("plcs", []):
         if plc.get("type") == "pump":
             pump_ids.append(plc.get("element_id"))
-            actuator_plc_by_elem.setdefault(plc.get("element_id"), plc)
+            pump_plc_by_elem.setdefault(plc.get("element_id"), plc["id"])
         if plc.get("type") == "valve":
             valve_ids.append(plc.get("element_id"))
-            actuator_plc_by_elem.setdefault(plc.get("element_id"), plc)
+            valve_plc_by_elem.setdefault(plc.get("element_id"), plc["id"])
         if plc.get("type") == "tank":
             tank_ids.append(plc.get("element_id"))
     pump_ids = _uniq(pump_ids)
     valve_ids = _uniq(valve_ids)
     tank_ids = _uniq(tank_ids)
-    actuator_plcs = list(actuator_plc_by_elem.values())
-    rows: List[Dict] = []
-
-    # Initial commands applied before first hydraulic step.
-    pump_commands: Dict[str, str] = {}
-    valve_commands: Dict[str, float] = {}
-    phys.apply_actuator_commands(pump_commands, valve_commands)
-
-    for step in range(total_steps):
-        # 1) Apply commands from previous iteration (already set) and advance hydraulics.
-        physical_state = phys.step()
-        if physical_state is None:
-            break
-
-        # 2) PLC/SCADA on current snapshot.
-        for plc_id, plc_logic in plc_logics.items():
-            request = plc_logic.build_request(physical_state)
-            reply = scada.handle_plc_request(request)
-            plc_logic.update_from_scada_reply(reply)
-
-        # 3) Aggregate next commands.
-        pump_commands = {}
-        valve_commands = {}
-        pump_seen = set()
-        valve_seen = set()
-        for plc in plc_cfg.get("plcs", []):
-            logic = plc_logics[plc["id"]]
-            effect = logic.get_actuator_effect()
-            if plc.get("type") == "pump":
-                elem = plc.get("element_id")
-                if elem in pump_seen:
-                    continue
-                pump_seen.add(elem)
-                pump_commands.update(effect)
-            if plc.get("type") == "valve":
-                elem = plc.get("element_id")
-                if elem in valve_seen:
-                    continue
-                valve_seen.add(elem)
-                valve_commands.update(effect)
-
-        logger.info(
-            "Step %d/%d: t=%ss pumps=%s valves=%s tanks=%s next_pump_cmds=%s next_valve_cmds=%s",
-            step + 1,
-            total_steps,
-            physical_state.get("time"),
-            physical_state.get("pumps", {}),
-            physical_state.get("valves", {}),
-            physical_state.get("tanks", {}),
-            pump_commands,
-            valve_commands,
-        )
+    pump_effects = [plc_logics[plc_id].get_actuator_effect for plc_id in pump_plc_by_elem.values()]
+    valve_effects = [plc_logics[plc_id].get_actuator_effect for plc_id in valve_plc_by_elem.values()]
 
-        row = {"time_s": physical_state.get("time")}
-        for tid in tank_ids:
-            row[f"tank_{tid}"] = physical_state.get("tanks", {}).get(tid)
-        for pid in pump_ids:
-            row[f"pump_{pid}"] = physical_state.get("pumps", {}).get(pid)
-        for vid in valve_ids:
-            row[f"valve_{vid}"] = physical_state.get("valves", {}).get(vid)
-        rows.append(row)
+    # Column names are fixed for the whole run: format them once and stream rows to disk.
+    tank_cols = [f"tank_{tid}" for tid in tank_ids]
+    fieldnames = ["time_s", *tank_cols]
+    fieldnames += [f"pump_{pid}" for pid in pump_ids]
+    fieldnames += [f"valve_{vid}" for vid in valve_ids]
+    if output_format == "parquet":
+        table_path = output_dir / "timeseries.parquet"
+        writer = _ParquetRowWriter(table_path, fieldnames, n_float=1 + len(tank_ids))
+        table_file = writer
+    else:
+        table_path = output_dir / "timeseries.csv"
+        table_file = table_path.open("w", newline="", encoding="utf-8")
+        writer = csv.writer(table_file)
+        writer.writerow(fieldnames)
+    # Only the tank series are kept in memory, for the plot: one preallocated row per step.
+    times = np.empty(total_steps, dtype=np.float64)
+    tank_levels = np.empty((total_steps, len(tank_ids)), dtype=np.float64)
+    n_rows = 0
 
-        # 4) Apply commands for next hydraulic step.
+    try:
+        # Initial commands applied before first hydraulic step.
+        pump_commands: Dict[str, str] = {}
+        valve_commands: Dict[str, float] = {}
         phys.apply_actuator_commands(pump_commands, valve_commands)
 
+        for step in range(total_steps):
+            # 1) Apply commands from previous iteration (already set) and advance hydraulics.
+            physical_state = phys.step()
+            if physical_state is None:
+                break
+
+            # 2) PLC/SCADA on current snapshot, exchanged as one batch per step.
+            requests = [plc_logic.build_request(physical_state) for plc_logic in plc_logics.values()]
+            replies = scada.handle_plc_request_batch(requests)
+            for plc_logic, reply in zip(plc_logics.values(), replies):
+                plc_logic.update_from_scada_reply(reply)
+
+            # 3) Aggregate next commands.
+            pump_commands = {}
+            valve_commands = {}
+            for effect in pump_effects:
+                pump_commands.update(effect())
+            for effect in valve_effects:
+                valve_commands.update(effect())
+
+            logger.info(
+                "Step %d/%d: t=%ss pumps=%s valves=%s tanks=%s next_pump_cmds=%s next_valve_cmds=%s",
+                step + 1,
+                total_steps,
+                physical_state.get("time"),
+                physical_state.get("pumps", {}),
+                physical_state.get("valves", {}),
+                physical_state.get("tanks", {}),
+                pump_commands,
+                valve_commands,
+            )
+
+            tanks = physical_state.get("tanks", {})
+            pumps = physical_state.get("pumps", {})
+            valves = physical_state.get("valves", {})
+            tank_values = [tanks.get(tid) for tid in tank_ids]
+            writer.writerow(
+                [
+                    physical_state.get("time"),
+                    *tank_values,
+                    *[pumps.get(pid) for pid in pump_ids],
+                    *[valves.get(vid) for vid in valve_ids],
+                ]
+            )
+            times[n_rows] = physical_state.get("time")
+            tank_levels[n_rows] = tank_values
+            n_rows += 1
+
+            # 4) Apply commands for next hydraulic step.
+            phys.apply_actuator_commands(pump_commands, valve_commands)
+    finally:
+        # Always finish the table so a failed run still leaves a readable file.
+        table_file.close()
     if topo is not None:
         topo.stop()
     try:
@@ -174,25 +259,17 @@ def main() -> None:
         pass
     logger.info("Simulation complete.")
 
-    if rows:
-        csv_path = output_dir / "timeseries.csv"
-        fieldnames = ["time_s"]
-        fieldnames += [f"tank_{tid}" for tid in tank_ids]
-        fieldnames += [f"pump_{pid}" for pid in pump_ids]
-        fieldnames += [f"valve_{vid}" for vid in valve_ids]
-        with csv_path.open("w", newline="", encoding="utf-8") as f:
-            writer = DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        logger.info("Wrote CSV to %s", csv_path)
+    if not n_rows:
+        # No step produced a snapshot: keep the old behaviour of writing no table.
+        table_path.unlink()
+    else:
+        logger.info("Wrote %s to %s", output_format.upper(), table_path)
 
         # Plot tank levels over time if present.
-        tank_cols = [f"tank_{tid}" for tid in tank_ids]
         if tank_cols:
             plt.figure(figsize=(8, 4))
-            times = [r["time_s"] for r in rows]
-            for col in tank_cols:
-                plt.plot(times, [r.get(col) for r in rows], label=col)
+            # One call draws every tank column of the 2-D array.
+            plt.plot(times[:n_rows], tank_levels[:n_rows], label=tank_cols)
             plt.xlabel("Time (s)")
             plt.ylabel("Tank level")
             plt.title("Tank levels over time")